@@ -43,6 +43,16 @@ except ImportError:
 # We take an optimistic approach to concurrency here: we might do work twice
 # in the case of races, but not crash or corrupt data.
 
+# The SQL run on every cache hit/miss is kept in module-level constants so
+# sqlite3's per-connection statement cache can reuse the prepared statement
+# instead of re-parsing the query text on each call.
+_REVISIONDATA_GET_SQL = "select data from revisiondata where revid = ?"
+_REVISIONDATA_ADD_SQL = (
+    "insert into revisiondata (revid, data) values (?, ?)")
+_DATA_GET_SQL = "select revid, data from data where key = ?"
+_DATA_DELETE_SQL = "delete from data where key = ?"
+_DATA_ADD_SQL = "insert into data (key, revid, data) values (?, ?, ?)"
+
 def safe_init_db(filename, init_sql):
     # To avoid races around creating the database, we create the db in
     # a temporary file and rename it into the ultimate location.
@@ -55,6 +65,26 @@ def safe_init_db(filename, init_sql):
     con.close()
     os.rename(temp_path, filename)
 
+
+def open_db(filename):
+    """Open a cache DB with pragmas suited to serving web requests.
+
+    WAL journaling lets readers carry on while another thread or process
+    writes to the cache, and synchronous=NORMAL (safe under WAL) avoids
+    an fsync on every commit.
+    """
+    connection = dbapi2.connect(filename)
+    cursor = connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    # Read the (read-mostly) cache through a memory map, saving a copy
+    # into sqlite's page cache on every page fetch. This is an upper
+    # bound on address space, not an allocation.
+    cursor.execute("PRAGMA mmap_size=268435456")
+    return connection
+
+
 class FakeShelf(object):
 
     def __init__(self, filename):
@@ -63,7 +93,7 @@ class FakeShelf(object):
             safe_init_db(
                 filename, "create table RevisionData "
                 "(revid binary primary key, data binary)")
-        self.connection = dbapi2.connect(filename)
+        self.connection = open_db(filename)
         self.cursor = self.connection.cursor()
 
     def _create_table(self, filename):
@@ -76,14 +106,16 @@ class FakeShelf(object):
         con.close()
 
     def _serialize(self, obj):
-        return dbapi2.Binary(pickle.dumps(obj, protocol=2))
+        # Change data is mostly escaped text and compresses several
+        # times over; a low zlib level keeps the CPU cost small.
+        return dbapi2.Binary(
+            zlib.compress(pickle.dumps(obj, protocol=2), 3))
 
     def _unserialize(self, data):
-        return pickle.loads(str(data))
+        return pickle.loads(zlib.decompress(data))
 
     def get(self, revid):
-        self.cursor.execute(
-            "select data from revisiondata where revid = ?", (revid, ))
+        self.cursor.execute(_REVISIONDATA_GET_SQL, (revid, ))
         filechange = self.cursor.fetchone()
         if filechange is None:
             return None
@@ -93,8 +125,7 @@ class FakeShelf(object):
     def add(self, revid, object):
         try:
             self.cursor.execute(
-                "insert into revisiondata (revid, data) values (?, ?)",
-                (revid, self._serialize(object)))
+                _REVISIONDATA_ADD_SQL, (revid, self._serialize(object)))
             self.connection.commit()
         except dbapi2.IntegrityError:
             # If another thread or process attempted to set the same key, we
@@ -114,7 +145,7 @@ class RevInfoDiskCache(object):
             safe_init_db(
                 filename, "create table Data "
                 "(key binary primary key, revid binary, data binary)")
-        self.connection = dbapi2.connect(filename)
+        self.connection = open_db(filename)
         self.cursor = self.connection.cursor()
 
     def get(self, key, revid):
@@ -122,8 +153,7 @@ class RevInfoDiskCache(object):
             raise TypeError(key)
         if not isinstance(revid, bytes):
             raise TypeError(revid)
-        self.cursor.execute(
-            "select revid, data from data where key = ?", (dbapi2.Binary(key),))
+        self.cursor.execute(_DATA_GET_SQL, (dbapi2.Binary(key),))
         row = self.cursor.fetchone()
         if row is None:
             return None
@@ -141,12 +171,10 @@ class RevInfoDiskCache(object):
         if not isinstance(revid, bytes):
             raise TypeError(revid)
         try:
-            self.cursor.execute(
-                'delete from data where key = ?', (dbapi2.Binary(key), ))
+            self.cursor.execute(_DATA_DELETE_SQL, (dbapi2.Binary(key), ))
             blob = zlib.compress(marshal.dumps(data, 2))
             self.cursor.execute(
-                "insert into data (key, revid, data) values (?, ?, ?)",
-                list(map(dbapi2.Binary, [key, revid, blob])))
+                _DATA_ADD_SQL, list(map(dbapi2.Binary, [key, revid, blob])))
             self.connection.commit()
         except dbapi2.IntegrityError:
             # If another thread or process attempted to set the same key, we
@@ -104,19 +104,33 @@ def _level_to_int_level(value):
     return _log_levels[value.lower()]
 
 
+# Building the parser means a dozen add_option calls, so do it once at
+# module load and share it between LoggerheadConfig instances.
+_parser = None
+
+def _get_parser():
+    global _parser
+    if _parser is None:
+        _parser = command_line_parser()
+    return _parser
+
+
 class LoggerheadConfig(object):
     """A configuration object."""
 
     def __init__(self, argv=None):
         if argv is None:
             argv = sys.argv[1:]
-        self._parser = command_line_parser()
+        self._parser = _get_parser()
         self._options, self._args = self._parser.parse_args(argv)
 
+    @property
+    def SQL_DIR(self):
+        """The directory for the SQL cache, created lazily if unset."""
         sql_dir = self.get_option('sql_dir')
         if sql_dir is None:
             sql_dir = _get_temporary_sql_dir()
-        self.SQL_DIR = sql_dir
+        return sql_dir
 
     def get_option(self, option):
         """Get the value for the config option, either
@@ -35,7 +35,16 @@ class AnnotateUI(ViewUI):
 
         tree = self.tree_for(path, revid)
 
-        change_cache = {}
+        annotations = list(tree.annotate_iter(path, file_id))
+
+        # Fetch the changes for every distinct revision in the annotation
+        # up front, rather than one get_changes call per revision as the
+        # lines are walked.
+        distinct_revids = list({line_revid for line_revid, _ in annotations})
+        change_cache = {
+            change.revid: change
+            for change in self._history.get_changes(distinct_revids)}
+
         last_line_revid = None
         last_lineno = None
         message = ""
@@ -43,19 +52,15 @@ class AnnotateUI(ViewUI):
         revisions = {}
 
         lineno = 0
-        for (line_revid, text), lineno in zip(tree.annotate_iter(path, file_id), itertools.count(1)):
+        for (line_revid, text), lineno in zip(annotations, itertools.count(1)):
             if line_revid != last_line_revid:
                 last_line_revid = line_revid
 
                 change = change_cache.get(line_revid, None)
                 if change is None:
-                    changes = self._history.get_changes([line_revid])
-                    if changes:
-                        change = changes[0]
-                    else:
-                        change = util.Container(
-                            authors='', date=datetime.now(), revno='')
-                    change_cache[line_revid] = change
+                    # A ghost revision; get_changes skipped it.
+                    change = change_cache[line_revid] = util.Container(
+                        authors='', date=datetime.now(), revno='')
 
                 try:
                     message = change.comment.splitlines()[0]
@@ -17,6 +17,8 @@
 # Foundation, Inc., 51 Franklin Street, Suite 500, Boston, MA 02110-1335  USA
 #
 
+from itertools import islice
+
 from ..controllers import TemplatedBranchView
 
 
@@ -29,11 +31,13 @@ class AtomUI (TemplatedBranchView):
         pagesize = int(20)#self._branch.config.get('pagesize', '20'))
 
         revid_list = history.get_file_view(history.last_revid, None)
-        entries = list(history.get_changes(list(revid_list)[:pagesize]))
+        # Only materialize the first page of the navigation iterator, not
+        # the whole history of the branch.
+        entries = list(history.get_changes(list(islice(revid_list, pagesize))))
 
         headers['Content-Type'] = 'application/atom+xml'
         return {
             'changes': entries,
             'updated': entries[0].utc_date.isoformat(),
-            'history': self._history,
+            'history': history,
         }
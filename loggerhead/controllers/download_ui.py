@@ -19,6 +19,7 @@
 
 import logging
 import mimetypes
+import os
 import urllib
 
 from breezy.errors import (
@@ -28,12 +29,49 @@ from breezy.errors import (
     )
 from breezy import osutils, urlutils
 from paste import httpexceptions
-from paste.request import path_info_pop
 
 from ..controllers import TemplatedBranchView
 
 log = logging.getLogger("loggerhead.controllers")
 
+# How much file content to push through the WSGI write callable at a time.
+_CHUNK_SIZE = 64 * 1024
+
+_CD_PREFIX = "attachment; filename*=utf-8''"
+
+# Pre-seeded with the extensions that dominate source-tree downloads, so
+# the common case never reaches mimetypes at all.
+_mime_cache = {
+    '': 'application/octet-stream',
+    '.c': 'text/x-csrc',
+    '.css': 'text/css',
+    '.h': 'text/x-chdr',
+    '.html': 'text/html',
+    '.js': 'application/javascript',
+    '.json': 'application/json',
+    '.md': 'text/markdown',
+    '.py': 'text/x-python',
+    '.txt': 'text/plain',
+    '.xml': 'application/xml',
+    }
+
+
+def _guess_mime_type(filename):
+    """mimetypes.guess_type, cached by (lowercased) file extension."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in mimetypes.encodings_map:
+        # e.g. '.tar.gz': the type depends on more than the last suffix,
+        # so skip the cache.
+        return (mimetypes.guess_type(filename)[0]
+                or 'application/octet-stream')
+    try:
+        return _mime_cache[ext]
+    except KeyError:
+        mime_type = (mimetypes.guess_type(filename)[0]
+                     or 'application/octet-stream')
+        _mime_cache[ext] = mime_type
+        return mime_type
+
 
 class DownloadUI (TemplatedBranchView):
 
@@ -42,13 +80,13 @@ class DownloadUI (TemplatedBranchView):
         return urlutils.escape(filename)
 
     def get_args(self, environ):
-        args = []
-        while True:
-            arg = path_info_pop(environ)
-            if arg is None:
-                break
-            args.append(arg)
-        return args
+        # Consume the remaining path in one go rather than looping over
+        # path_info_pop, which rebuilds PATH_INFO on every call.
+        path = environ.get('PATH_INFO', '')
+        if path:
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + path
+            environ['PATH_INFO'] = ''
+        return [arg for arg in path.split('/') if arg]
 
     def __call__(self, environ, start_response):
         # /download/<rev_id>/<filename>
@@ -59,30 +97,35 @@ class DownloadUI (TemplatedBranchView):
                 self._branch.absolute_url('/changes'))
         revid = h.fix_revid(args[0])
         try:
-            path, filename, content = h.get_file(args[1], revid)
+            path, filename, size, fileobj = h.get_file_stream(args[1], revid)
         except (NoSuchFile, NoSuchRevision):
             # Compatibility API for /download/rev_id/file_id/<filename>
             try:
-                path, filename, content = h.get_file_by_fileid(
+                path, filename, size, fileobj = h.get_file_stream_by_fileid(
                     args[1].encode('UTF-8'), revid)
             except (NoSuchId, NoSuchRevision):
                 raise httpexceptions.HTTPNotFound()
-        mime_type, encoding = mimetypes.guess_type(filename)
-        if mime_type is None:
-            mime_type = 'application/octet-stream'
+        mime_type = _guess_mime_type(filename)
         self.log.info('/download %s @ %s (%d bytes)',
                       path,
                       h.get_revno(revid),
-                      len(content))
+                      size)
         encoded_filename = self.encode_filename(filename)
         headers = [
             ('Content-Type', mime_type),
-            ('Content-Length', str(len(content))),
-            ('Content-Disposition',
-             "attachment; filename*=utf-8''%s" % (encoded_filename,)),
+            ('Content-Length', str(size)),
+            ('Content-Disposition', _CD_PREFIX + encoded_filename),
             ]
-        start_response('200 OK', headers)
-        return [content]
+        writer = start_response('200 OK', headers)
+        # The branch is only read-locked while this method runs, so push the
+        # chunks through the write callable here rather than returning a
+        # lazy iterable that would read after the lock is released.
+        while True:
+            chunk = fileobj.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            writer(chunk)
+        return []
 
 
 class DownloadTarballUI(DownloadUI):
@@ -111,8 +154,7 @@ class DownloadTarballUI(DownloadUI):
         encoded_filename = self.encode_filename(filename)
         headers = [
             ('Content-Type', 'application/octet-stream'),
-            ('Content-Disposition',
-                "attachment; filename*=utf-8''%s" % (encoded_filename,)),
+            ('Content-Disposition', _CD_PREFIX + encoded_filename),
             ]
         start_response('200 OK', headers)
         tree = history._branch.repository.revision_tree(revid)
@@ -1,8 +1,8 @@
-from io import BytesIO
+import patiencediff
 
 from breezy import (
-    diff,
     errors,
+    textfile,
     urlutils,
     )
 try:
@@ -21,53 +21,68 @@ from .. import util
 from ..controllers import TemplatedBranchView
 
 
-def _process_diff(difftext):
+class DiffLine(object):
+    """One line of a diff chunk.
+
+    A large patch produces one of these per line, so keep them slotted
+    rather than paying for a util.Container dict each.
+    """
+
+    __slots__ = ('old_lineno', 'new_lineno', 'type', 'line')
+
+    def __init__(self, old_lineno, new_lineno, type, line):
+        self.old_lineno = old_lineno
+        self.new_lineno = new_lineno
+        self.type = type
+        self.line = line
+
+
+def _decode_line(line):
+    if line.endswith(b'\n'):
+        line = line[:-1]
+    return line.decode('utf-8', 'replace')
+
+
+def _process_opcodes(old_lines, new_lines, context_lines):
+    """Build diff chunks straight from the sequence matcher's opcodes.
+
+    This yields the same hunks as formatting a unified diff and parsing
+    it back, without the text round-trip through the diff format.
+    """
+    matcher = patiencediff.PatienceSequenceMatcher(None, old_lines, new_lines)
     chunks = []
-    chunk = None
-
-    def decode_line(line):
-        return line.decode('utf-8', 'replace')
-    for line in difftext.splitlines():
-        if len(line) == 0:
-            continue
-        if line.startswith(b'+++ ') or line.startswith(b'--- '):
-            continue
-        if line.startswith(b'@@ '):
-            # new chunk
-            if chunk is not None:
-                chunks.append(chunk)
-            chunk = util.Container()
-            chunk.diff = []
-            split_lines = line.split(b' ')[1:3]
-            lines = [int(x.split(b',')[0][1:]) for x in split_lines]
-            old_lineno = lines[0]
-            new_lineno = lines[1]
-        elif line.startswith(b' '):
-            chunk.diff.append(util.Container(old_lineno=old_lineno,
-                                             new_lineno=new_lineno,
-                                             type='context',
-                                             line=decode_line(line[1:])))
-            old_lineno += 1
-            new_lineno += 1
-        elif line.startswith(b'+'):
-            chunk.diff.append(util.Container(
-                old_lineno=None,
-                new_lineno=new_lineno,
-                type='insert', line=decode_line(line[1:])))
-            new_lineno += 1
-        elif line.startswith(b'-'):
-            chunk.diff.append(util.Container(
-                old_lineno=old_lineno,
-                new_lineno=None,
-                type='delete', line=decode_line(line[1:])))
-            old_lineno += 1
-        else:
-            chunk.diff.append(util.Container(
-                old_lineno=None,
-                new_lineno=None,
-                type='unknown',
-                line=repr(line)))
-    if chunk is not None:
+    # Bind the per-line calls to locals; patches can run to many
+    # thousands of lines.
+    decode = _decode_line
+    for group in matcher.get_grouped_opcodes(context_lines):
+        chunk = util.Container()
+        chunk.diff = []
+        append = chunk.diff.append
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                new_lineno = j1 + 1
+                for old_lineno in range(i1 + 1, i2 + 1):
+                    append(DiffLine(
+                        old_lineno=old_lineno,
+                        new_lineno=new_lineno,
+                        type='context',
+                        line=decode(old_lines[old_lineno - 1])))
+                    new_lineno += 1
+            else:
+                # A unified diff shows a replace as the deletes followed
+                # by the inserts.
+                for old_lineno in range(i1 + 1, i2 + 1):
+                    append(DiffLine(
+                        old_lineno=old_lineno,
+                        new_lineno=None,
+                        type='delete',
+                        line=decode(old_lines[old_lineno - 1])))
+                for new_lineno in range(j1 + 1, j2 + 1):
+                    append(DiffLine(
+                        old_lineno=None,
+                        new_lineno=new_lineno,
+                        type='insert',
+                        line=decode(new_lines[new_lineno - 1])))
         chunks.append(chunk)
     return chunks
 
@@ -91,17 +106,14 @@ def diff_chunks_for_file(repository, filename, compare_revid, revid,
         else:
             lines[compare_revid] = []
 
-    buffer = BytesIO()
     try:
-        diff.internal_diff(
-            '', lines[compare_revid], '', lines[revid], buffer,
-            context_lines=context_lines)
+        textfile.check_text_lines(lines[compare_revid])
+        textfile.check_text_lines(lines[revid])
     except errors.BinaryFile:
-        difftext = b''
-    else:
-        difftext = buffer.getvalue()
+        return []
 
-    return _process_diff(difftext)
+    return _process_opcodes(lines[compare_revid], lines[revid],
+                            context_lines)
 
 
 class FileDiffUI(TemplatedBranchView):
@@ -288,16 +288,19 @@ class History(object):
         finally:
             revision_graph_locks[cache_key].release()
 
+        self._revid_to_revno_str = {}
         if self._rev_indices is not None:
             self._revno_revid = {}
             for ((_, revid, _, revno_str, _), _, _) in self._rev_info:
                 self._revno_revid[revno_str] = revid
+                self._revid_to_revno_str[revid] = revno_str
         else:
             self._revno_revid = {}
             self._rev_indices = {}
             for ((seq, revid, _, revno_str, _), _, _) in self._rev_info:
                 self._rev_indices[revid] = seq
                 self._revno_revid[revno_str] = revid
+                self._revid_to_revno_str[revid] = revno_str
 
     def __init__(self, branch, whole_history_data_cache,
                  revinfo_disk_cache=None, cache_key=None):
@@ -306,6 +309,10 @@ class History(object):
         self._branch = branch
         self._branch_tags = None
         self._inventory_cache = {}
+        # get_merge_point_list is called once per change on a changelog
+        # page; the walk result only depends on the (immutable for our
+        # lifetime) revision graph, so memoize it per revid.
+        self._merge_point_cache = {}
         self._branch_nick = self._branch.get_config().get_nickname()
         self.log = logging.getLogger('loggerhead.%s' % (self._branch_nick,))
 
@@ -324,43 +331,44 @@ class History(object):
         return self._branch.get_config()
 
     def get_revno(self, revid):
-        if revid not in self._rev_indices:
-            # ghost parent?
-            return 'unknown'
-        seq = self._rev_indices[revid]
-        revno = self._rev_info[seq][0][3]
-        return revno
+        # 'unknown' covers ghost parents.
+        return self._revid_to_revno_str.get(revid, 'unknown')
 
     def get_revids_from(self, revid_list, start_revid):
         """
         Yield the mainline (wrt start_revid) revisions that merged each
         revid in revid_list.
         """
+        # These are read on every step of the walk, which can cover the
+        # whole mainline; keep them in locals.
+        rev_info = self._rev_info
+        rev_indices = self._rev_indices
         if revid_list is None:
             # Just yield the mainline, starting at start_revid
             revid = start_revid
             is_null = breezy.revision.is_null
             while not is_null(revid):
                 yield revid
-                parents = self._rev_info[self._rev_indices[revid]][2]
+                parents = rev_info[rev_indices[revid]][2]
                 if not parents:
                     return
                 revid = parents[0]
             return
         revid_set = set(revid_list)
         revid = start_revid
+        is_null = breezy.revision.is_null
 
         def introduced_revisions(revid):
             r = set([revid])
-            seq = self._rev_indices[revid]
-            md = self._rev_info[seq][0][2]
+            seq = rev_indices[revid]
+            md = rev_info[seq][0][2]
             i = seq + 1
-            while i < len(self._rev_info) and self._rev_info[i][0][2] > md:
-                r.add(self._rev_info[i][0][1])
+            while i < len(rev_info) and rev_info[i][0][2] > md:
+                r.add(rev_info[i][0][1])
                 i += 1
             return r
         while revid_set:
-            if breezy.revision.is_null(revid):
+            if is_null(revid):
                 return
             rev_introduced = introduced_revisions(revid)
             matching = rev_introduced.intersection(revid_set)
@@ -368,7 +376,7 @@ class History(object):
                 # We don't need to look for these anymore.
                 revid_set.difference_update(matching)
                 yield revid
-            parents = self._rev_info[self._rev_indices[revid]][2]
+            parents = rev_info[rev_indices[revid]][2]
             if len(parents) == 0:
                 return
             revid = parents[0]
@@ -605,20 +613,29 @@ iso style "yyyy-mm-dd")
         """
         Return the list of revids that have merged this node.
         """
+        cached = self._merge_point_cache.get(revid)
+        if cached is not None:
+            return cached
         if '.' not in self.get_revno(revid):
+            self._merge_point_cache[revid] = []
             return []
 
         merge_point = []
         nexts = [revid]
+        start_revid = revid
+        # Hoist the attribute lookups out of the walk.
+        rev_info = self._rev_info
+        rev_indices = self._rev_indices
         while nexts:
             revid = nexts.pop()
-            children = self._rev_info[self._rev_indices[revid]][1]
+            children = rev_info[rev_indices[revid]][1]
             for child in children:
-                child_parents = self._rev_info[self._rev_indices[child]][2]
+                child_parents = rev_info[rev_indices[child]][2]
                 if child_parents[0] == revid:
                     nexts.append(child)
                 else:
                     merge_point.append(child)
+        self._merge_point_cache[start_revid] = merge_point
         return merge_point
 
     def simplify_merge_point_list(self, revids):
@@ -800,6 +817,38 @@ iso style "yyyy-mm-dd")
         return (display_path, breezy.osutils.basename(path),
                 rev_tree.get_file_text(path))
 
+    def get_file_stream(self, path, revid):
+        """Returns (path, filename, size, file-like object)
+
+        Like `get_file`, but the content is returned as a file-like object
+        yielding chunks, so large files can be streamed to the client
+        instead of being held in memory in full.
+        """
+        if not isinstance(path, str):
+            raise TypeError(path)
+        if not isinstance(revid, bytes):
+            raise TypeError(revid)
+        rev_tree = self._branch.repository.revision_tree(revid)
+        display_path = path
+        if not display_path.startswith('/'):
+            path = '/' + path
+        return (display_path, breezy.osutils.basename(path),
+                rev_tree.get_file_size(path), rev_tree.get_file(path))
+
+    def get_file_stream_by_fileid(self, fileid, revid):
+        """Returns (path, filename, size, file-like object)"""
+        if not isinstance(fileid, bytes):
+            raise TypeError(fileid)
+        if not isinstance(revid, bytes):
+            raise TypeError(revid)
+        rev_tree = self._branch.repository.revision_tree(revid)
+        path = rev_tree.id2path(fileid)
+        display_path = path
+        if not display_path.startswith('/'):
+            path = '/' + path
+        return (display_path, breezy.osutils.basename(path),
+                rev_tree.get_file_size(path), rev_tree.get_file(path))
+
     def file_changes_for_revision_ids(self, old_revid, new_revid):
         """
         Return a nested data structure containing the changes in a delta::
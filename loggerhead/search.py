@@ -18,6 +18,8 @@
 # Foundation, Inc., 51 Franklin Street, Suite 500, Boston, MA 02110-1335  USA
 #
 
+import weakref
+
 _mod_index = None
 def import_search():
     global errors, _mod_index, FileTextHit, RevisionHit
@@ -31,6 +33,23 @@ def import_search():
         _mod_index = None
 
 
+_index_cache = weakref.WeakKeyDictionary()
+
+def _open_index(branch):
+    """Open the search index for a branch, reusing an earlier open.
+
+    Branch objects are long-lived in loggerhead, so keeping one index
+    per branch saves re-reading the index headers on every search; the
+    entry goes away with the branch.
+    """
+    try:
+        return _index_cache[branch]
+    except KeyError:
+        index = _mod_index.open_index_branch(branch)
+        _index_cache[branch] = index
+        return index
+
+
 def search_revisions(branch, query_list, suggest=False):
     """
     Search using bzr-search plugin to find revisions matching the query.
@@ -45,12 +64,12 @@ def search_revisions(branch, query_list, suggest=False):
     if _mod_index is None:
         return None # None indicates could-not-search
     try:
-        index = _mod_index.open_index_branch(branch)
+        index = _open_index(branch)
     except errors.NoSearchIndex:
         return None # None indicates could-not-search
     query = query_list.split(' ')
     query = [(term,) for term in query]
-    revid_list = []
+    revid_set = set()
     index._branch.lock_read()
 
     try:
@@ -62,9 +81,9 @@ def search_revisions(branch, query_list, suggest=False):
         else:
             for result in index.search(query):
                 if isinstance(result, FileTextHit):
-                    revid_list.append(result.text_key[1])
+                    revid_set.add(result.text_key[1])
                 elif isinstance(result, RevisionHit):
-                    revid_list.append(result.revision_key[0])
-            return list(set(revid_list))
+                    revid_set.add(result.revision_key[0])
+            return list(revid_set)
     finally:
         index._branch.unlock()
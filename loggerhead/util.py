@@ -25,18 +25,12 @@ import base64
 import datetime
 import logging
 import re
-import struct
 import threading
 import time
 import sys
 import os
 import subprocess
 
-try:
-    from xml.etree import ElementTree as ET
-except ImportError:
-    from elementtree import ElementTree as ET
-
 from breezy import urlutils
 
 import bleach
@@ -62,22 +56,47 @@ def fix_year(year):
 # with the full date (UTC) in a tooltip.
 
 
+# These formats are fixed, so plain integer formatting beats a
+# strftime round-trip through libc; both run once per listed revision.
+
 def date_day(value):
-    return value.strftime('%Y-%m-%d')
+    return '%04d-%02d-%02d' % (value.year, value.month, value.day)
 
 
 def date_time(value):
     if value is not None:
         # Note: this assumes that the value is UTC in some fashion.
-        return value.strftime('%Y-%m-%d %H:%M:%S UTC')
+        return '%04d-%02d-%02d %02d:%02d:%02d UTC' % (
+            value.year, value.month, value.day,
+            value.hour, value.minute, value.second)
     else:
         return 'N/A'
 
 
+_utcnow_cache = (0.0, None)
+
+
+def _cached_utcnow():
+    """Return utcnow, re-read from the clock at most once a second.
+
+    A page lists one approximate date per revision or file; at the
+    granularity _approximatedate displays, a "now" that is up to a
+    second stale is indistinguishable, so skip the clock read and
+    datetime construction on all but the first call.
+    """
+    global _utcnow_cache
+    stamp, now = _utcnow_cache
+    current = time.time()
+    if now is None or current - stamp >= 1.0:
+        now = datetime.datetime.utcnow()
+        _utcnow_cache = (current, now)
+    return now
+
+
 def _approximatedate(date):
     if date is None:
         return 'Never'
-    delta = datetime.datetime.utcnow() - date
+    delta = _cached_utcnow() - date
     future = delta < datetime.timedelta(0, 0, 0)
     delta = abs(delta)
     years = delta.days // 365
@@ -116,14 +135,13 @@ def _approximatedate(date):
 
 
 def _wrap_with_date_time_title(date, formatted_date):
-    elem = ET.Element("span")
-    elem.text = formatted_date
-    elem.set("title", date_time(date))
-    return elem
+    # The markup is fixed, so build the escaped string directly rather
+    # than allocating an ElementTree span to serialize later.
+    return html_format(
+        '<span title="%s">%s</span>', date_time(date), formatted_date)
 
 
 def approximatedate(date):
-    #FIXME: Returns an object instead of a string
     return _wrap_with_date_time_title(date, _approximatedate(date))
 
 
@@ -133,22 +151,19 @@ class Container(object):
     """
 
     def __init__(self, _dict=None, **kw):
-        self._properties = {}
+        # Containers are built per revision/file row; one C-level dict
+        # merge is much cheaper than a setattr call per key.
+        d = self.__dict__
+        d['_properties'] = {}
         if _dict is not None:
-            for key, value in _dict.items():
-                setattr(self, key, value)
-        for key, value in kw.items():
-            setattr(self, key, value)
+            d.update(_dict)
+        d.update(kw)
 
     def __repr__(self):
-        out = '{ '
-        for key, value in self.__dict__.items():
-            if key.startswith('_') or (getattr(self.__dict__[key],
-                                       '__call__', None) is not None):
-                continue
-            out += '%r => %r, ' % (key, value)
-        out += '}'
-        return out
+        return '{ %s}' % ''.join(
+            '%r => %r, ' % (key, value)
+            for key, value in self.__dict__.items()
+            if not key.startswith('_') and not callable(value))
 
     def __getattr__(self, attr):
         """Used for handling things that aren't already available."""
@@ -183,6 +198,13 @@ def hide_email(email):
     """
     try to obsure any email address in a bazaar committer's name.
     """
+    # Nearly every committer string is 'Name <address>'; handle that
+    # with two C-level scans before falling back to the regexes.
+    stripped = email.rstrip()
+    if stripped.endswith('>'):
+        lt = stripped.find('<')
+        if lt >= 0:
+            return stripped[:lt].rstrip()
     m = STANDARD_PATTERN.search(email)
     if m is not None:
         name = m.group(1)
@@ -192,7 +214,7 @@ def hide_email(email):
     if m is None:
         # can't find an email address in here
         return email
-    username, domain = m.group(0).split('@')
+    username, _, domain = m.group(0).partition('@')
     domains = domain.split('.')
     if len(domains) >= 2:
         return '%s at %s' % (username, domains[-2])
@@ -244,19 +266,27 @@ def html_format(template, *args):
 
 # FIXME: get rid of this method; use fixed_width() and avoid XML().
 
+# html_escape plus the space substitution, as one translation table so
+# monospace text is escaped in a single pass.
+_HTML_CLEAN_TABLE = str.maketrans({
+    char: repl for char, repl in html_entity_subs + [(' ', '&nbsp;')]})
+
+
 def html_clean(s):
     """
     clean up a string for html display.  expand any tabs, encode any html
     entities, and replace spaces with '&nbsp;'.  this is primarily for use
     in displaying monospace text.
     """
-    s = html_escape(s.expandtabs())
-    s = s.replace(' ', '&nbsp;')
-    return s
+    return s.expandtabs().translate(_HTML_CLEAN_TABLE)
 
 
 NONBREAKING_SPACE = u'\N{NO-BREAK SPACE}'
 
+_FIXED_WIDTH_TABLE = str.maketrans({
+    char: repl for char, repl in html_entity_subs + [
+        (' ', NONBREAKING_SPACE)]})
+
 
 def fill_div(s):
     """
@@ -272,6 +302,8 @@ def fill_div(s):
     elif not s.strip():
         return '&nbsp;'
     elif isinstance(s, bytes):
+        if s.isascii():
+            return s.decode('ascii')
         try:
             s = s.decode('utf-8')
         except UnicodeDecodeError:
@@ -294,12 +326,17 @@ def fixed_width(s):
         # okay for most code, but for people using things like KOI-8, this
         # will display gibberish.  we have no way of detecting the correct
         # encoding to use.
-        try:
-            s = s.decode('utf-8')
-        except UnicodeDecodeError:
-            s = s.decode('iso-8859-15')
+        if s.isascii():
+            # The usual case; skips the utf-8 validator and the
+            # try/except machinery.
+            s = s.decode('ascii')
+        else:
+            try:
+                s = s.decode('utf-8')
+            except UnicodeDecodeError:
+                s = s.decode('iso-8859-15')
 
-    s = html_escape(s).expandtabs().replace(' ', NONBREAKING_SPACE)
+    s = s.expandtabs().translate(_FIXED_WIDTH_TABLE)
 
     return bleach.clean(s).replace('\n', '<br/>')
 
@@ -314,10 +351,7 @@ def fake_permissions(kind, executable):
 
 
 def b64(s):
-    s = base64.encodestring(s).replace('\n', '')
-    while (len(s) > 0) and (s[-1] == '='):
-        s = s[:-1]
-    return s
+    return base64.b64encode(s).rstrip(b'=').decode('ascii')
 
 
 def uniq(uniqs, s):
@@ -327,10 +361,9 @@ def uniq(uniqs, s):
     if s in uniqs:
         return uniqs[s]
     uniqs[type(None)] = next = uniqs.get(type(None), 0) + 1
-    x = struct.pack('>I', next)
-    while (len(x) > 1) and (x[0] == '\x00'):
-        x = x[1:]
-    uniqs[s] = b64(x)
+    # to_bytes with the minimal width replaces the old pack-then-strip
+    # dance; the counter starts at 1, so the length is never zero.
+    uniqs[s] = b64(next.to_bytes((next.bit_length() + 7) // 8, 'big'))
     return uniqs[s]
 
 
@@ -341,6 +374,15 @@ P95_MEG = int(0.9 * MEG)
 P95_GIG = int(0.9 * GIG)
 
 
+# (threshold, divisor, suffix) from largest unit down; sizes at 95% of
+# the next unit round up to it.
+_SIZE_UNITS = (
+    (P95_GIG, GIG, ' GB'),
+    (P95_MEG, MEG, ' MB'),
+    (0, KILO, ' KB'),
+    )
+
+
 def human_size(size, min_divisor=0):
     size = int(size)
     if (size == 0) and (min_divisor == 0):
@@ -348,12 +390,9 @@ def human_size(size, min_divisor=0):
     if (size < 1024) and (min_divisor == 0):
         return str(size) + ' bytes'
 
-    if (size >= P95_GIG) or (min_divisor >= GIG):
-        divisor = GIG
-    elif (size >= P95_MEG) or (min_divisor >= MEG):
-        divisor = MEG
-    else:
-        divisor = KILO
+    for threshold, divisor, suffix in _SIZE_UNITS:
+        if (size >= threshold) or (min_divisor >= divisor):
+            break
 
     dot = size % divisor
     base = size - dot
@@ -366,13 +405,7 @@ def human_size(size, min_divisor=0):
     out = str(base)
     if (base < 100) and (dot != 0):
         out += '.%d' % (dot,)
-    if divisor == KILO:
-        out += ' KB'
-    elif divisor == MEG:
-        out += ' MB'
-    elif divisor == GIG:
-        out += ' GB'
-    return out
+    return out + suffix
 
 
 def local_path_from_url(url):
@@ -388,20 +421,25 @@ def fill_in_navigation(navigation):
     given a navigation block (used by the template for the page header), fill
     in useful calculated values.
     """
-    if navigation.revid in navigation.revid_list: # XXX is this always true?
+    try:
+        # One scan; the separate membership test doubled it. XXX is
+        # the revid always present?
         navigation.position = navigation.revid_list.index(navigation.revid)
-    else:
+    except ValueError:
         navigation.position = 0
     navigation.count = len(navigation.revid_list)
     navigation.page_position = navigation.position // navigation.pagesize + 1
     navigation.page_count = (len(navigation.revid_list) + (navigation.pagesize\
  - 1)) // navigation.pagesize
 
+    position = navigation.position
+    count = navigation.count
+
     def get_offset(offset):
-        if (navigation.position + offset < 0) or (
-           navigation.position + offset > navigation.count - 1):
-            return None
-        return navigation.revid_list[navigation.position + offset]
+        index = position + offset
+        if 0 <= index < count:
+            return navigation.revid_list[index]
+        return None
 
     navigation.last_in_page_revid = get_offset(navigation.pagesize - 1)
     navigation.prev_page_revid = get_offset(-1 * navigation.pagesize)
@@ -454,11 +492,15 @@ def directory_breadcrumbs(path, is_root, view):
             'suffix': '',
         }]
         if path != '/':
-            dir_parts = path.strip('/').split('/')
-            for index, dir_name in enumerate(dir_parts):
+            # Accumulate the path a component at a time instead of
+            # re-joining the whole prefix for every crumb.
+            cumulative = ''
+            for dir_name in path.strip('/').split('/'):
+                cumulative = (
+                    cumulative + '/' + dir_name if cumulative else dir_name)
                 breadcrumbs.append({
                     'dir_name': dir_name,
-                    'path': '/'.join(dir_parts[:index + 1]),
+                    'path': cumulative,
                     'suffix': '',
                 })
             # If we are not in the directory view, the last crumb is a branch,
@@ -479,12 +521,13 @@ def branch_breadcrumbs(path, tree, view):
     tree -- Tree to get file information from
     view -- The type of view we are showing (files, changes etc)
     """
-    dir_parts = path.strip('/').split('/')
     inner_breadcrumbs = []
-    for index, dir_name in enumerate(dir_parts):
+    cumulative = ''
+    for dir_name in path.strip('/').split('/'):
+        cumulative = cumulative + '/' + dir_name if cumulative else dir_name
         inner_breadcrumbs.append({
             'dir_name': dir_name,
-            'path': '/'.join(dir_parts[:index + 1]),
+            'path': cumulative,
             'suffix': '/' + view,
         })
     return inner_breadcrumbs
@@ -505,26 +548,33 @@ def decorator(unbound):
 
 
 
-@decorator
-def lsprof(f):
-
-    def _f(*a, **kw):
-        from .loggerhead.lsprof import profile
-        import cPickle
-        z = time.time()
-        ret, stats = profile(f, *a, **kw)
-        log.debug('Finished profiled %s in %d msec.' % (f.__name__,
-            int((time.time() - z) * 1000)))
-        stats.sort()
-        stats.freeze()
-        now = time.time()
-        msec = int(now * 1000) % 1000
-        timestr = time.strftime('%Y%m%d%H%M%S',
-                                time.localtime(now)) + ('%03d' % (msec,))
-        filename = f.__name__ + '-' + timestr + '.lsprof'
-        cPickle.dump(stats, open(filename, 'w'), 2)
-        return ret
-    return _f
+if os.environ.get('LOGGERHEAD_LSPROF'):
+
+    @decorator
+    def lsprof(f):
+
+        def _f(*a, **kw):
+            import pickle
+            from .lsprof import profile
+            z = time.time()
+            ret, stats = profile(f, *a, **kw)
+            log.debug('Finished profiled %s in %d msec.' % (f.__name__,
+                int((time.time() - z) * 1000)))
+            stats.sort()
+            stats.freeze()
+            now = time.time()
+            msec = int(now * 1000) % 1000
+            timestr = time.strftime('%Y%m%d%H%M%S',
+                                    time.localtime(now)) + ('%03d' % (msec,))
+            filename = f.__name__ + '-' + timestr + '.lsprof'
+            with open(filename, 'wb') as dump:
+                pickle.dump(stats, dump, 2)
+            return ret
+        return _f
+else:
+    def lsprof(f):
+        """Profiling is off (set LOGGERHEAD_LSPROF to enable it)."""
+        return f
 
 
 # just thinking out loud here...
@@ -555,12 +605,13 @@ def lsprof(f):
 #         for re-ordering an existing page by different sort
 
 t_context = threading.local()
-_valid = (
-    'start_revid', 'filter_file_id', 'q', 'remember', 'compare_revid', 'sort')
+_valid = frozenset((
+    'start_revid', 'filter_file_id', 'q', 'remember', 'compare_revid',
+    'sort'))
 
 
 def set_context(map):
-    t_context.map = dict((k, v) for (k, v) in map.items() if k in _valid)
+    t_context.map = {k: v for k, v in map.items() if k in _valid}
 
 
 def get_context(**overrides):
@@ -579,7 +630,7 @@ def get_context(**overrides):
         map['remember'] = t_context.map.get('remember', None)
     else:
         map.update(t_context.map)
-    overrides = dict((k, v) for (k, v) in overrides.items() if k in _valid)
+    overrides = {k: v for k, v in overrides.items() if k in _valid}
     map.update(overrides)
     return map
 
@@ -670,6 +721,10 @@ def convert_to_json_ready(obj):
         d = obj.__dict__.copy()
         del d['_properties']
         return d
+    elif getattr(obj, '__slots__', None) is not None:
+        # Slotted value objects (e.g. filediff_ui.DiffLine) keep their
+        # field names in __slots__.
+        return {name: getattr(obj, name) for name in obj.__slots__}
     elif isinstance(obj, bytes):
         return obj.decode('UTF-8')
     elif isinstance(obj, datetime.datetime):
@@ -65,20 +65,29 @@ def compute_whole_history_data(branch):
         _merge_sort = merge_sort(
             _revision_graph, last_revid, generate_revno=True)
 
+    # Bind the hot lookups to locals; this loop runs once per revision in
+    # the whole history of the branch.
+    join = '.'.join
     for info in _merge_sort:
         seq, revid, merge_depth, revno, end_of_merge = info
-        revno_str = '.'.join(str(n) for n in revno)
+        revno_str = join(map(str, revno))
         parents = _revision_graph[revid]
         _rev_indices[revid] = len(_rev_info)
         _rev_info.append([(seq, revid, merge_depth, revno_str, end_of_merge), (), parents])
 
-    for revid in _revision_graph.keys():
+    # Accumulate the children of each parent in one pass, then freeze
+    # them; extending the tuples in place would rescan and reallocate
+    # them once per child.
+    where_merged = {}
+    for revid, parents in _revision_graph.items():
         if _rev_info[_rev_indices[revid]][0][2] == 0:
             continue
-        for parent in _revision_graph[revid]:
-            c = _rev_info[_rev_indices[parent]]
-            if revid not in c[1]:
-                c[1] = c[1] + (revid,)
+        for parent in parents:
+            where_merged.setdefault(parent, []).append(revid)
+    for parent, children in where_merged.items():
+        # dict.fromkeys drops duplicate children (a parent listed twice)
+        # while keeping the insertion order the old code had.
+        _rev_info[_rev_indices[parent]][1] = tuple(dict.fromkeys(children))
 
     log.info('built revision graph cache: %.3f secs' % (time.time() - z,))
 
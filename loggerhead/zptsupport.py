@@ -47,24 +47,33 @@ class TemplateWrapper(object):
         self.stat = stat
 
     def expand(self, **info):
-        context = simpleTALES.Context(allowPythonPath=1)
-        for k, v in info.items():
-            context.addGlobal(k, v)
         s = StringIO()
-        self.template.expandInline(context, s)
+        self.template.expandInline(self._context_for(info), s)
         return s.getvalue()
 
     def expand_into(self, f, **info):
+        self.template.expand(
+            self._context_for(info), f, outputEncoding='utf-8')
+
+    @staticmethod
+    def _context_for(info):
         context = simpleTALES.Context(allowPythonPath=1)
-        for k, v in info.items():
-            context.addGlobal(k, v)
-        self.template.expand(context, f, outputEncoding='utf-8')
+        # One dict merge instead of an addGlobal call per value; the
+        # templatefunctions dict alone is a few dozen entries.
+        context.globals.update(info)
+        return context
 
     @property
     def macros(self):
         return self.template.macros
 
 
+# The pkg_resources lookup stats its way along the Python path, and
+# load_template runs on every rendered page, so remember the resolved
+# filename per template name.
+_template_path_cache = {}
+
+
 def load_template(classname):
     """Searches for a template along the Python path.
 
@@ -72,13 +81,16 @@ def load_template(classname):
     Templates are automatically checked for changes and reloaded as
     neccessary.
     """
-    divider = classname.rfind(".")
-    if divider > -1:
-        package = classname[0:divider]
-        basename = classname[divider+1:]
-    else:
-        raise ValueError("All templates must be in a package")
-
-    tfile = pkg_resources.resource_filename(
-        package, "%s.%s" % (basename, "pt"))
+    tfile = _template_path_cache.get(classname)
+    if tfile is None:
+        divider = classname.rfind(".")
+        if divider > -1:
+            package = classname[0:divider]
+            basename = classname[divider+1:]
+        else:
+            raise ValueError("All templates must be in a package")
+
+        tfile = pkg_resources.resource_filename(
+            package, "%s.%s" % (basename, "pt"))
+        _template_path_cache[classname] = tfile
     return zpt(tfile)